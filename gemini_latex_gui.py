@@ -18,7 +18,7 @@ import sys
 from pathlib import Path
 
 import fitz
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSettings
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSettings, QStandardPaths
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QFont
 from PyQt6.QtWidgets import (
     QApplication,
@@ -547,7 +547,7 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.settings = Settings()
         self.input_file: Path | None = None
-        self.output_dir = Path.home() / "Desktop"
+        self._output_dir_default: Path | None = None
         self.worker = None
         
         # App settings storage
@@ -582,6 +582,20 @@ class MainWindow(QMainWindow):
         if saved_model:
             self.settings.model_name = saved_model
 
+    @property
+    def output_dir(self) -> Path:
+        """Cartella di output corrente: quella digitata nella UI, altrimenti il Desktop."""
+        dest_entry = getattr(self, "dest_entry", None)
+        if dest_entry is not None and dest_entry.text().strip():
+            return Path(dest_entry.text())
+        if self._output_dir_default is None:
+            # Risolto solo alla prima visualizzazione: Qt tiene in cache il path
+            # standard, evitando lookup di sistema durante __init__.
+            desktop = QStandardPaths.writableLocation(
+                QStandardPaths.StandardLocation.DesktopLocation
+            )
+            self._output_dir_default = Path(desktop) if desktop else Path.home()
+        return self._output_dir_default
 
     def _apply_theme(self):
         self.setStyleSheet("""
@@ -985,8 +999,7 @@ class MainWindow(QMainWindow):
     def _select_output(self):
         d = QFileDialog.getExistingDirectory(self, "Seleziona cartella")
         if d:
-            self.output_dir = Path(d)
-            self.dest_entry.setText(str(self.output_dir))
+            self.dest_entry.setText(d)
 
     def _start_processing(self):
         if not self.input_file:
@@ -1000,7 +1013,6 @@ class MainWindow(QMainWindow):
             )
             return
 
-        self.output_dir = Path(self.dest_entry.text())
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
         self.process_btn.setEnabled(False)
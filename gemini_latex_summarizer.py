@@ -10,19 +10,20 @@ License: MIT
 
 from __future__ import annotations
 
-import base64
 import mimetypes
+import os
 import re
 import sys
+import time
+from io import BytesIO
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Protocol, runtime_checkable
+from typing import Iterator, Protocol, runtime_checkable
 
-import fitz  # PyMuPDF
 import google.generativeai as genai
-from docx import Document as DocxDocument
-from PIL import Image
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from rich.console import Console
@@ -36,13 +37,17 @@ from rich.progress import (
     TimeElapsedColumn,
 )
 from rich.syntax import Syntax
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
+from google.api_core.exceptions import (
+    DeadlineExceeded,
+    ResourceExhausted,
+    ServiceUnavailable,
 )
 
+try:
+    import pyvips  # Optional: libvips shrink-on-load for large non-JPEG images
+except ImportError:
+    pyvips = None
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -62,6 +67,8 @@ class Settings(BaseSettings):
     max_chunk_size: int = Field(default=100_000, ge=1000)
     temperature: float = Field(default=0.3, ge=0.0, le=2.0)
     output_dir: Path = Field(default=Path("./output"))
+    # Syntax-highlighted preview is expensive (Pygments lex); opt-in only
+    show_preview: bool = Field(default=False, alias="SHOW_PREVIEW")
 
     @field_validator("output_dir", mode="before")
     @classmethod
@@ -229,56 +236,161 @@ class ContentExtractor(Protocol):
 class PDFExtractor:
     """PDF content extractor using PyMuPDF (fitz)."""
 
+    MAX_IMAGES = 10
+    PARALLEL_THRESHOLD = 4  # below this, process spawn cost is not amortized
+    RENDER_DPI = 150
+    RENDER_TEXT_THRESHOLD = 100  # chars across the first pages
+
+    def __init__(self) -> None:
+        # Deferred so invocations on other formats skip the PyMuPDF load
+        global fitz
+        import fitz
+
     def extract(self, file_path: Path) -> tuple[str, list[bytes]]:
         """Extract text and embedded images from PDF."""
-        text_parts: list[str] = []
-        images: list[bytes] = []
-
         with fitz.open(file_path) as doc:
-            for page_num, page in enumerate(doc, start=1):
-                # Extract text with layout preservation
-                text = page.get_text("text")
-                if text.strip():
-                    text_parts.append(f"--- Pagina {page_num} ---\n{text}")
+            # Scanned PDFs: render each page once instead of text-extract
+            # plus per-xref image decode (the text would be empty anyway)
+            if self._is_image_heavy(doc):
+                return "", self._render_pages(doc)
+
+            if len(doc) < self.PARALLEL_THRESHOLD:
+                return self._extract_serial(doc)
+
+            # Fan pages out to worker processes; each re-opens the PDF
+            # (cheap) and returns text plus the page's image xrefs
+            with ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, 4)
+            ) as executor:
+                results = list(
+                    executor.map(
+                        partial(self._extract_page, str(file_path)),
+                        range(len(doc)),
+                        chunksize=4,
+                    )
+                )
+
+            text_parts = [
+                f"--- Pagina {page_num + 1} ---\n{text}"
+                for page_num, text, _ in results
+                if text and not text.isspace()
+            ]
+
+            xrefs: set[int] = set()
+            for _, _, page_xrefs in results:
+                xrefs.update(page_xrefs)
+
+            return "\n\n".join(text_parts), self._decode_images(doc, xrefs)
+
+    @staticmethod
+    def _extract_page(path: str, page_num: int) -> tuple[int, str, list[int]]:
+        """Worker: extract one page's text and image xrefs in a subprocess."""
+        import fitz
+
+        with fitz.open(path) as doc:
+            page = doc[page_num]
+            return (
+                page_num,
+                page.get_text("text"),
+                [img[0] for img in page.get_images(full=True)],
+            )
 
-                # Extract images (limit to avoid memory issues)
-                if len(images) < 10:
-                    for img_index, img in enumerate(page.get_images(full=True)):
-                        try:
-                            xref = img[0]
-                            base_image = doc.extract_image(xref)
-                            images.append(base_image["image"])
-                        except Exception:
-                            continue
+    def _extract_serial(self, doc: fitz.Document) -> tuple[str, list[bytes]]:
+        """In-process extraction path for short PDFs."""
+        text_parts: list[str | None] = [None] * len(doc)
+        xrefs: set[int] = set()
+
+        for page_num, page in enumerate(doc, start=1):
+            # Extract text with layout preservation
+            text = page.get_text("text")
+            if text and not text.isspace():
+                text_parts[page_num - 1] = f"--- Pagina {page_num} ---\n{text}"
+
+            # Collect image xrefs; the same image referenced from many
+            # pages is recorded (and later decoded) only once
+            if len(xrefs) < self.MAX_IMAGES:
+                xrefs.update(img[0] for img in page.get_images(full=True))
+
+        return "\n\n".join(filter(None, text_parts)), self._decode_images(doc, xrefs)
+
+    def _is_image_heavy(self, doc: fitz.Document) -> bool:
+        """Detect scanned/image-heavy PDFs: first pages carry almost no text."""
+        if len(doc) == 0:
+            return False
+        sampled = sum(
+            len(doc[i].get_text("text").strip()) for i in range(min(3, len(doc)))
+        )
+        return sampled < self.RENDER_TEXT_THRESHOLD
 
-        return "\n\n".join(text_parts), images
+    def _render_pages(self, doc: fitz.Document) -> list[bytes]:
+        """Render pages straight to downscaled JPEGs for multimodal input."""
+        images: list[bytes] = []
+        for page in doc:
+            if len(images) >= self.MAX_IMAGES:
+                break
+            try:
+                pix = page.get_pixmap(dpi=self.RENDER_DPI)
+                images.append(pix.tobytes("jpeg", jpg_quality=80))
+            except Exception:
+                continue
+        return images
+
+    def _decode_images(self, doc: fitz.Document, xrefs: set[int]) -> list[bytes]:
+        """Decode each unique image exactly once (limit to avoid memory issues)."""
+        images: list[bytes] = []
+        for xref in xrefs:
+            if len(images) >= self.MAX_IMAGES:
+                break
+            try:
+                images.append(doc.extract_image(xref)["image"])
+            except Exception:
+                continue
+        return images
 
 
 class DocxExtractor:
     """Word document (.docx) content extractor."""
 
+    def __init__(self) -> None:
+        global DocxDocument
+        from docx import Document as DocxDocument
+
     def extract(self, file_path: Path) -> tuple[str, list[bytes]]:
         """Extract text from DOCX file."""
         doc = DocxDocument(file_path)
         text_parts: list[str] = []
 
+        # Resolve each unique style's heading level once; python-docx walks
+        # lazy XML on every style.name access otherwise. The key is the
+        # underlying w:pStyle styleId string (None for the default style):
+        # para.style builds a fresh proxy per access, so its id() is not a
+        # stable identity
+        style_levels: dict[str | None, int | None] = {}
+
         for para in doc.paragraphs:
             if para.text.strip():
+                style_id = para._p.style
+                try:
+                    level = style_levels[style_id]
+                except KeyError:
+                    name = para.style.name
+                    level = int(name[8:]) if name.startswith("Heading ") else None
+                    style_levels[style_id] = level
+
                 # Preserve heading styles
-                if para.style.name.startswith("Heading"):
-                    level = para.style.name.replace("Heading ", "")
-                    text_parts.append(f"\n{'#' * int(level)} {para.text}\n")
+                if level is not None:
+                    text_parts.append(f"\n{'#' * level} {para.text}\n")
                 else:
                     text_parts.append(para.text)
 
-        # Extract tables
+        # Extract tables (single join, no intermediate row list)
         for table in doc.tables:
-            table_text = []
-            for row in table.rows:
-                row_text = " | ".join(cell.text.strip() for cell in row.cells)
-                table_text.append(row_text)
+            table_text = "\n".join(
+                " | ".join(cell.text.strip() for cell in row.cells)
+                for row in table.rows
+            )
             if table_text:
-                text_parts.append("\n[TABELLA]\n" + "\n".join(table_text) + "\n")
+                text_parts.append("\n[TABELLA]\n" + table_text + "\n")
 
         return "\n".join(text_parts), []
 
@@ -287,10 +399,52 @@ class ImageExtractor:
     """Image file extractor with preprocessing."""
 
     MAX_DIMENSION = 2048
+    VIPS_SUFFIXES = {".png", ".webp", ".tif", ".tiff"}
+
+    _qtables = None  # quality-85 quantization tables, baked on first save
+
+    def __init__(self) -> None:
+        global Image
+        from PIL import Image
+
+    @classmethod
+    def _jpeg_qtables(cls):
+        """Derive the quality-85 quantization tables once and reuse them.
+
+        Passing explicit qtables to save() lets libjpeg skip the per-call
+        quality-to-table derivation.
+        """
+        if cls._qtables is None:
+            probe_buf = BytesIO()
+            Image.new("RGB", (8, 8)).save(probe_buf, format="JPEG", quality=85)
+            probe_buf.seek(0)
+            with Image.open(probe_buf) as probe:
+                probe.load()
+                cls._qtables = probe.quantization
+        return cls._qtables
 
     def extract(self, file_path: Path) -> tuple[str, list[bytes]]:
         """Process image and return as bytes for multimodal input."""
+        # For formats without a JPEG draft mode, libvips' streaming
+        # thumbnail pipeline (shrink-on-load) beats a full Pillow decode
+        if pyvips is not None and file_path.suffix.lower() in self.VIPS_SUFFIXES:
+            try:
+                thumb = pyvips.Image.thumbnail(
+                    str(file_path),
+                    self.MAX_DIMENSION,
+                    height=self.MAX_DIMENSION,
+                    size="down",
+                )
+                return "", [thumb.jpegsave_buffer(Q=85)]
+            except pyvips.Error:
+                pass  # Fall back to the Pillow path below
+
         with Image.open(file_path) as img:
+            # For JPEG, let libjpeg downscale during decode (DCT scaling):
+            # the Lanczos pass below then runs on a much smaller buffer
+            if img.format == "JPEG":
+                img.draft("JPEG", (self.MAX_DIMENSION, self.MAX_DIMENSION))
+
             # Convert to RGB if necessary
             if img.mode in ("RGBA", "P"):
                 img = img.convert("RGB")
@@ -301,29 +455,34 @@ class ImageExtractor:
                 new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
                 img = img.resize(new_size, Image.Resampling.LANCZOS)
 
-            # Save to bytes
-            from io import BytesIO
-
+            # Save to bytes; 4:2:0 chroma subsampling shrinks the JPEG
+            # (and everything encoded downstream) by roughly a third
             buffer = BytesIO()
-            img.save(buffer, format="JPEG", quality=85)
+            img.save(
+                buffer,
+                format="JPEG",
+                qtables=self._jpeg_qtables(),
+                subsampling=2,
+                optimize=False,
+                progressive=False,
+            )
             return "", [buffer.getvalue()]
 
 
 class ExtractorFactory:
     """Factory for creating appropriate content extractor."""
 
-    _extractors: dict[FileType, ContentExtractor] = {
-        FileType.PDF: PDFExtractor(),
-        FileType.DOCX: DocxExtractor(),
-        FileType.IMAGE: ImageExtractor(),
-    }
-
     @classmethod
+    @lru_cache(maxsize=None)
     def get_extractor(cls, file_type: FileType) -> ContentExtractor:
-        """Get extractor instance for file type."""
-        if file_type not in cls._extractors:
-            raise ValueError(f"No extractor available for file type: {file_type}")
-        return cls._extractors[file_type]
+        """Get the (memoized) extractor instance for file type."""
+        if file_type is FileType.PDF:
+            return PDFExtractor()
+        if file_type is FileType.DOCX:
+            return DocxExtractor()
+        if file_type is FileType.IMAGE:
+            return ImageExtractor()
+        raise ValueError(f"No extractor available for file type: {file_type}")
 
 
 # =============================================================================
@@ -331,6 +490,10 @@ class ExtractorFactory:
 # =============================================================================
 
 
+# Single alternation compiled once: one linear pass over the response
+# instead of three pattern searches
+_CODEBLOCK_RE = re.compile(r"```(?:latex|tex)?\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
+
 def format_latex_output(raw_response: str) -> str:
     """Clean Gemini response to extract pure LaTeX code.
 
@@ -342,17 +505,9 @@ def format_latex_output(raw_response: str) -> str:
     text = raw_response.strip()
 
     # Remove markdown code blocks
-    patterns = [
-        r"```latex\s*(.*?)\s*```",
-        r"```tex\s*(.*?)\s*```",
-        r"```\s*(.*?)\s*```",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-        if match:
-            text = match.group(1).strip()
-            break
+    match = _CODEBLOCK_RE.search(text)
+    if match:
+        text = match.group(1).strip()
 
     # Ensure document structure exists
     if r"\documentclass" not in text:
@@ -373,6 +528,11 @@ def format_latex_output(raw_response: str) -> str:
 # =============================================================================
 
 
+# Only these are worth retrying; anything else (including our own
+# empty-response ValueError) should fail fast
+_TRANSIENT_API_ERRORS = (ServiceUnavailable, ResourceExhausted, DeadlineExceeded)
+
+
 class GeminiClient:
     """Wrapper for Google Gemini API with retry logic."""
 
@@ -388,39 +548,49 @@ class GeminiClient:
             ),
         )
 
-    @retry(
-        retry=retry_if_exception_type((Exception,)),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=60),
-        reraise=True,
-    )
+    def _start_stream(self, parts: list):
+        """Open a streaming generation request, retrying only transient errors."""
+        for attempt in range(3):
+            try:
+                return self.model.generate_content(parts, stream=True)
+            except _TRANSIENT_API_ERRORS:
+                if attempt == 2:
+                    raise
+                time.sleep(min(60, 4 * 2**attempt))
+
     def generate_summary(
         self, text_content: str, images: list[bytes] | None = None
-    ) -> str:
-        """Generate LaTeX summary from content with retry logic."""
+    ) -> Iterator[str]:
+        """Generate LaTeX summary from content, yielding text as it streams."""
         parts = []
 
         # Add text content
         if text_content:
             parts.append(f"## CONTENUTO DEL DOCUMENTO\n\n{text_content}")
 
-        # Add images as multimodal input
+        # Add images as multimodal input: adjacent parts form one prompt, so
+        # a single trailing marker costs fewer tokens than one per image.
+        # The SDK accepts raw bytes and handles wire encoding itself.
         if images:
-            for idx, img_bytes in enumerate(images[:5]):  # Limit images
-                parts.append({
-                    "mime_type": "image/jpeg",
-                    "data": base64.b64encode(img_bytes).decode("utf-8"),
-                })
-                parts.append(f"[Immagine {idx + 1} del documento]")
+            image_parts = [
+                {"mime_type": "image/jpeg", "data": img_bytes}
+                for img_bytes in images[:5]  # Limit images
+            ]
+            parts.extend(image_parts)
+            parts.append(
+                f"Nel documento sono allegate {len(image_parts)} immagini."
+            )
 
-        # Generate response
-        response = self.model.generate_content(parts)
+        # Stream response chunks as they arrive
+        received = False
+        for chunk in self._start_stream(parts):
+            if chunk.text:
+                received = True
+                yield chunk.text
 
-        if not response.text:
+        if not received:
             raise ValueError("Empty response from Gemini API")
 
-        return response.text
-
 
 # =============================================================================
 # MAIN PIPELINE
@@ -471,9 +641,12 @@ class LaTeXSummarizer:
             text_content, images = extractor.extract(input_path)
             progress.update(task, advance=1)
 
-            # Step 2: Generate summary via Gemini
+            # Step 2: Generate summary via Gemini (streamed)
             progress.update(task, description="[yellow]Generating LaTeX via Gemini...")
-            raw_latex = self.client.generate_summary(text_content, images)
+            raw_parts: list[str] = []
+            for piece in self.client.generate_summary(text_content, images):
+                raw_parts.append(piece)
+            raw_latex = "".join(raw_parts)
             progress.update(task, advance=1)
 
             # Step 3: Format output
@@ -485,17 +658,21 @@ class LaTeXSummarizer:
         output_filename = input_path.stem + "_summary.tex"
         output_path = self.settings.output_dir / output_filename
 
-        output_path.write_text(clean_latex, encoding="utf-8")
-
-        # Display result
-        self.console.print(
-            Panel(
-                Syntax(clean_latex[:2000] + "\n\n[...]" if len(clean_latex) > 2000 else clean_latex,
-                       "latex", theme="monokai", line_numbers=True),
-                title="📝 Generated LaTeX (preview)",
-                border_style="green",
+        # Encode once and write bytes: skips the TextIOWrapper buffering layer
+        output_path.write_bytes(clean_latex.encode("utf-8"))
+
+        # Display result (preview is opt-in: Pygments lexing blocks the exit)
+        if self.settings.show_preview:
+            self.console.print(
+                Panel(
+                    Syntax(clean_latex[:2000] + "\n\n[...]" if len(clean_latex) > 2000 else clean_latex,
+                           "latex", theme="monokai", line_numbers=True),
+                    title="📝 Generated LaTeX (preview)",
+                    border_style="green",
+                )
             )
-        )
+        else:
+            self.console.print(f"Saved {len(clean_latex):,} characters of LaTeX")
 
         self.console.print(
             f"\n[bold green]✓[/] Output saved to: [underline]{output_path}[/]\n"
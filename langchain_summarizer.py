@@ -3,7 +3,7 @@
 LangChain PDF Summarizer - State of the Art
 ============================================
 Implementazione professionale usando:
-- PyMuPDF4LLM per estrazione PDF → Markdown ottimale
+- PyMuPDF (fitz) per estrazione PDF → Markdown diretta
 - LangChain con strategia REFINE per summarization iterativa
 - Google Gemini come LLM backend
 
@@ -12,14 +12,23 @@ Basato sulla documentazione ufficiale LangChain.
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
+import re
+import string
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property, lru_cache, partial
+from io import StringIO
 from pathlib import Path
 from typing import Callable
 
-import pymupdf4llm
+import fitz
+import google.generativeai as genai
 from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -30,6 +39,20 @@ from langchain_text_splitters import (
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+try:
+    # Optional: orjson serializza/deserializza in C, 2-5x piu veloce di json
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj) -> str:
+        return json.dumps(obj, indent=2)
+
+    _json_loads = json.loads
+
 
 # =============================================================================
 # CONFIGURATION
@@ -150,6 +173,154 @@ Alla fine del documento, aggiungi:
 )
 
 
+# Tutto ciò che precede questa sezione di STUFF_PROMPT è statico (regole e
+# formato) e può essere riusato lato server via context caching di Gemini
+_STUFF_SPLIT_MARKER = "📄 DOCUMENTO DA RIASSUMERE"
+
+# Fence markdown (```latex ... ```) attorno all'output del modello:
+# compilata una volta sola, match ancorato sull'intera stringa
+_FENCE_RE = re.compile(r"\A```[a-zA-Z]*\n(.*?)\n?```\s*\Z", re.DOTALL)
+
+
+# Classificazione errori API: prima gli attributi tipizzati (O(1)), poi al
+# massimo due scansioni regex C-level del messaggio invece di una catena
+# di controlli "in" a livello Python
+_STATUS_RE = re.compile(r"\b(429|403|400|500|503)\b")
+_RL_RE = re.compile(r"quota|rate|resource_exhausted", re.IGNORECASE)
+
+
+def _classify_api_error(e: Exception) -> tuple[str, bool]:
+    """Ritorna (status_code, is_rate_limit) per un'eccezione API."""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+
+    err_str = str(e)
+    if status is None:
+        match = _STATUS_RE.search(err_str)
+        status = match.group(1) if match else None
+
+    status_str = str(status) if status is not None else "N/A"
+    is_rate_limit = status_str == "429" or _RL_RE.search(err_str) is not None
+    return status_str, is_rate_limit
+
+
+# Escape dei caratteri speciali LaTeX nel testo del riassunto: senza
+# questo passaggio un "&" nel corpo è un errore di compilazione e un "%"
+# commenta silenziosamente il resto della riga
+_LATEX_ESCAPE_MAP = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+_LATEX_ESCAPE_RE = re.compile(r"[\\&%$#_{}~^]")
+
+
+def _escape_latex(text: str) -> str:
+    """Escape dei caratteri speciali LaTeX in una sola scansione."""
+    return _LATEX_ESCAPE_RE.sub(lambda m: _LATEX_ESCAPE_MAP[m.group()], text)
+
+
+# Conversione deterministica riassunto → LaTeX: i marker emoji e gli heading
+# markdown sono imposti dai prompt di riassunto, quindi la mappatura verso
+# ambienti e sezionamento è regex-sostituibile senza chiamate API.
+# I pattern lavorano sul testo GIÀ escapato ("#" è diventato "\#").
+_LATEX_ENV_PATTERNS = [
+    (
+        re.compile(r"📖 DEFINIZIONE:\s*(.+?)(?=\n\n|\Z)", re.DOTALL),
+        r"\\begin{definition}\n\1\n\\end{definition}",
+    ),
+    (
+        re.compile(r"⚖️ NORMATIVA:\s*(.+?)(?=\n\n|\Z)", re.DOTALL),
+        r"\\begin{lawbox}\n\1\n\\end{lawbox}",
+    ),
+    (
+        # STUFF usa "CONCETTO CHIAVE:", INITIAL/REFINE solo "CONCETTO:"
+        re.compile(r"🔑 CONCETTO(?: CHIAVE)?:\s*(.+?)(?=\n\n|\Z)", re.DOTALL),
+        r"\\begin{concept}\n\1\n\\end{concept}",
+    ),
+    (
+        re.compile(r"📌 ESEMPIO:\s*(.+?)(?=\n\n|\Z)", re.DOTALL),
+        r"\\begin{example}\n\1\n\\end{example}",
+    ),
+    (
+        re.compile(r"💡 APPROFONDIMENTO:\s*(.+?)(?=\n\n|\Z)", re.DOTALL),
+        r"\\begin{insight}\n\1\n\\end{insight}",
+    ),
+]
+
+# Marker di sezione riepilogativa → titoli non numerati: il contenuto che
+# segue (liste numerate) resta testo normale
+_MARKER_HEADING_PATTERNS = [
+    (
+        re.compile(r"(?m)^📝 PUNTI CHIAVE SEZIONE:[ \t]*"),
+        "\\\\subsection*{Punti Chiave della Sezione}\n",
+    ),
+    (
+        re.compile(r"(?m)^📝 PUNTI MEMORIZZABILI:[ \t]*"),
+        "\\\\subsection*{Punti Memorizzabili}\n",
+    ),
+    (
+        re.compile(r"(?m)^🎯 SOMMARIO FINALE:[ \t]*"),
+        "\\\\chapter*{Sommario Finale}\n",
+    ),
+]
+
+# Heading markdown → sezionamento LaTeX. L'escape trasforma "##" in
+# "\#\#", quindi i pattern matchano la forma escapata (dal livello più
+# profondo: l'ordine esplicito evita sorprese)
+_MD_HEADING_PATTERNS = [
+    (re.compile(r"(?m)^(?:\\#){3} +(.+?)\s*$"), r"\\subsection{\1}"),
+    (re.compile(r"(?m)^(?:\\#){2} +(.+?)\s*$"), r"\\section{\1}"),
+    (re.compile(r"(?m)^\\# +(.+?)\s*$"), r"\\chapter{\1}"),
+]
+
+_MD_ANY_HEADING_RE = re.compile(r"(?m)^#{1,3} ")
+_MD_BULLET_BLOCK_RE = re.compile(r"(?m)((?:^[-*] .+\n?)+)")
+
+# Emoji residue (marker non previsti, decorazioni del modello): con
+# inputenc utf8 ognuna è un errore di compilazione, vanno rimosse
+_EMOJI_RE = re.compile(r"[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]")
+
+
+def _markdown_to_latex_body(summary: str) -> str:
+    """Conversione locale del riassunto markdown in corpo LaTeX."""
+    body = _escape_latex(summary)
+    for pattern, replacement in _LATEX_ENV_PATTERNS:
+        body = pattern.sub(replacement, body)
+    for pattern, replacement in _MARKER_HEADING_PATTERNS:
+        body = pattern.sub(replacement, body)
+    for pattern, replacement in _MD_HEADING_PATTERNS:
+        body = pattern.sub(replacement, body)
+
+    def _itemize(match: re.Match) -> str:
+        items = "".join(
+            f"    \\item {line[2:].strip()}\n"
+            for line in match.group(1).splitlines()
+        )
+        return "\\begin{itemize}\n" + items + "\\end{itemize}\n"
+
+    return _EMOJI_RE.sub("", _MD_BULLET_BLOCK_RE.sub(_itemize, body))
+
+
+def _strip_md_fence(text: str) -> str:
+    """Rimuove l'eventuale fence markdown che racchiude il testo."""
+    match = _FENCE_RE.match(text)
+    if match:
+        return match.group(1)
+    if text.startswith("```"):
+        # Fence aperta ma non chiusa: scarta solo la prima riga
+        return text.split("\n", 1)[1] if "\n" in text else ""
+    return text
+
+
 LATEX_TEMPLATE = r"""\documentclass[11pt,a4paper]{scrreprt}
 \usepackage[utf8]{inputenc}
 \usepackage[T1]{fontenc}
@@ -203,6 +374,15 @@ LATEX_TEMPLATE = r"""\documentclass[11pt,a4paper]{scrreprt}
     boxrule=0.8pt
 }
 
+\newtcolorbox{insight}{
+    colback=yellow!5!white,
+    colframe=yellow!60!black,
+    fonttitle=\bfseries,
+    title=Approfondimento,
+    sharp corners,
+    boxrule=0.8pt
+}
+
 \pagestyle{fancy}
 \fancyhf{}
 \fancyhead[L]{\leftmark}
@@ -210,7 +390,7 @@ LATEX_TEMPLATE = r"""\documentclass[11pt,a4paper]{scrreprt}
 
 \begin{document}
 
-\title{%TITLE%}
+\title{${TITLE}}
 \author{Riassunto Completo per lo Studio}
 \date{\today}
 \maketitle
@@ -218,17 +398,142 @@ LATEX_TEMPLATE = r"""\documentclass[11pt,a4paper]{scrreprt}
 \tableofcontents
 \newpage
 
-%CONTENT%
+${CONTENT}
 
 \end{document}
 """
 
+# Template precompilato: substitute fa una sola scansione del template
+# invece delle due passate dei .replace concatenati
+_LATEX_TEMPLATE_SUB = string.Template(LATEX_TEMPLATE)
+
+
+# =============================================================================
+# PDF EXTRACTION (cached)
+# =============================================================================
+
+
+# Soglie (dimensione span / mediana documento) → livello di heading markdown
+_HEADING_SCALES = ((1.6, 1), (1.3, 2), (1.15, 3))
+
+
+def _extract_page_lines(pdf_path: str, page_num: int) -> list[tuple[float, str]]:
+    """Worker: (dimensione massima span, testo) per ogni riga della pagina.
+
+    Una tupla con testo vuoto marca il confine fra blocchi (paragrafo).
+    Ogni worker apre il PDF per conto suo: fitz non è thread-safe sullo
+    stesso Document e l'open costa pochi millisecondi.
+    """
+    records: list[tuple[float, str]] = []
+    with fitz.open(pdf_path) as doc:
+        for block in doc[page_num].get_text("dict")["blocks"]:
+            if block.get("type") != 0:
+                continue
+            for line in block.get("lines", []):
+                spans = line.get("spans", [])
+                text = "".join(span["text"] for span in spans).strip()
+                if text:
+                    records.append((max(span["size"] for span in spans), text))
+            records.append((0.0, ""))
+    return records
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list[list[tuple[float, str]]]:
+    """Estrae in parallelo le righe delle pagine [start, stop)."""
+    with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, 8)) as executor:
+        return list(
+            executor.map(partial(_extract_page_lines, pdf_path), range(start, stop))
+        )
+
+
+def _assemble_markdown(page_lines: list[list[tuple[float, str]]]) -> str:
+    """Assembla le righe estratte in markdown con heading da font-size.
+
+    La mediana delle dimensioni è calcolata sulle pagine passate; il testo
+    confluisce in uno StringIO senza grandi stringhe intermedie.
+    """
+    sizes = sorted(
+        size for lines in page_lines for size, text in lines if text
+    )
+    median_size = sizes[len(sizes) // 2] if sizes else 12.0
+
+    out = StringIO()
+    for lines in page_lines:
+        for size, text in lines:
+            if not text:
+                out.write("\n")
+                continue
+            level = next(
+                (lvl for scale, lvl in _HEADING_SCALES if size >= median_size * scale),
+                0,
+            )
+            if level:
+                out.write(f"{'#' * level} {text}\n\n")
+            else:
+                out.write(text + "\n")
+    return out.getvalue()
+
+
+@lru_cache(maxsize=8)
+def _extract_markdown(pdf_path: str, n_pages: int, mtime_ns: int) -> str:
+    """Estrazione PDF → Markdown con fitz diretto, cacheata per path.
+
+    Le pagine vengono lette in parallelo (get_text rilascia il GIL nel C di
+    MuPDF) e i titoli ricavati confrontando la dimensione massima degli span
+    con la mediana del documento. Il numero di pagine arriva dal chiamante,
+    che il documento l'ha già aperto: niente parse duplicato del PDF.
+    mtime_ns fa parte della chiave: un PDF rigenerato in place invalida
+    la entry anche nei processi longevi (la GUI) e a pari numero di pagine.
+    """
+    if n_pages == 0:
+        return ""
+    return _assemble_markdown(_extract_page_range(pdf_path, 0, n_pages))
+
 
 # =============================================================================
 # DATA STRUCTURES
 # =============================================================================
 
 
+class TokenBucket:
+    """Rate limiter a token bucket sulla quota req/min di una chiave.
+
+    Consente burst fino alla capacità e dorme solo quando la quota è
+    davvero vicina all'esaurimento, al posto di pause fisse tra le
+    chiamate; refill continuo basato su time.monotonic.
+    """
+
+    def __init__(self, rpm: int = 60):
+        self.capacity = float(rpm)
+        self.tokens = float(rpm)
+        self.rate = rpm / 60.0  # token al secondo
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Preleva un token; ritorna 0, oppure i secondi da attendere."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last) * self.rate
+            )
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Blocca finché un token non è disponibile."""
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Come acquire, ma cede il controllo all'event loop in attesa."""
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+
 @dataclass
 class ProcessingStats:
     """Statistiche di elaborazione"""
@@ -251,7 +556,7 @@ class LangChainSummarizer:
     Summarizer professionale usando LangChain.
 
     Pipeline:
-    1. PyMuPDF4LLM estrae PDF → Markdown (preserva struttura)
+    1. PyMuPDF estrae PDF → Markdown (heading da euristica font-size)
     2. MarkdownHeaderTextSplitter divide per sezioni logiche
     3. RecursiveCharacterTextSplitter per chunk di dimensione gestibile
     4. Strategia REFINE per summarization iterativa
@@ -260,6 +565,10 @@ class LangChainSummarizer:
     Supporta rotazione multi-API key per evitare rate limiting.
     """
 
+    # Oltre questa soglia il documento viene estratto e riassunto in
+    # streaming a batch di pagine, senza materializzare tutto il markdown
+    STREAM_PAGE_THRESHOLD = 1500
+
     def __init__(
         self,
         settings: Settings | None = None,
@@ -277,21 +586,45 @@ class LangChainSummarizer:
         
         self.current_key_index = 0
         self.key_cooldowns = {}  # key_index -> cooldown_end_time
-        
-        # Initialize LLM with first key
-        self._init_llm(self.api_keys[0] if self.api_keys else "")
-
-    def _init_llm(self, api_key: str):
-        """Initialize or reinitialize LLM with given API key."""
-        os.environ["GOOGLE_API_KEY"] = api_key
-        # Gemini 2.0 Flash supporta fino a 65536 output tokens
-        # Usiamo il massimo per evitare troncamento dei riassunti lunghi
-        self.llm = ChatGoogleGenerativeAI(
+
+        # One LLM instance per key for the parallel MAP phase
+        self.llms = [self._build_llm(key) for key in self.api_keys]
+
+        # Un token bucket per chiave (quota Gemini: 60 req/min): burst
+        # immediati finché c'è quota, attesa solo a ridosso del limite
+        self.rate_limiters = [
+            TokenBucket(rpm=60) for _ in range(max(1, len(self.api_keys)))
+        ]
+
+        # Cache persistente delle risposte LLM: con temperature=0.1 le
+        # chiamate sono quasi deterministiche, quindi un hit esatto su
+        # (modello, temperatura, prompt) evita la chiamata di rete
+        self._llm_cache_dir = Path.home() / ".cache" / "pytextsummer"
+        self._llm_cache_mem: dict[str, str] = {}
+
+        # Context caching del prefisso STUFF (creato pigramente, best effort)
+        self._cached_stuff_model = None
+        self._cached_stuff_tried = False
+
+        # Client attivo: punta dentro il pool, la rotazione è un'assegnazione
+        self.llm = self.llms[0] if self.llms else self._build_llm("")
+
+    def _build_llm(self, api_key: str) -> ChatGoogleGenerativeAI:
+        """Build an LLM client bound to a specific API key.
+
+        The REST transport keeps one HTTP session per client, so the
+        long-lived per-key clients in self.llms reuse TLS connections
+        (keep-alive) across all refine steps instead of handshaking on
+        every call.
+        """
+        return ChatGoogleGenerativeAI(
             model=self.settings.model_name,
             temperature=0.1,
-            max_output_tokens=65536,  # Massimo per Gemini 2.0 Flash
+            max_output_tokens=65536,
+            google_api_key=api_key or None,
+            transport="rest",
         )
-    
+
     def _rotate_api_key(self) -> bool:
         """Rotate to next available API key. Returns True if successful."""
         if len(self.api_keys) <= 1:
@@ -306,8 +639,9 @@ class LangChainSummarizer:
             # Check if this key is still in cooldown
             cooldown_end = self.key_cooldowns.get(self.current_key_index, 0)
             if current_time >= cooldown_end:
-                # Key available, switch to it
-                self._init_llm(self.api_keys[self.current_key_index])
+                # Key available: switch is an O(1) assignment into the
+                # prebuilt pool, no client rebuild and no env mutation
+                self.llm = self.llms[self.current_key_index]
                 self.progress(f"🔄 Rotazione API Key #{self.current_key_index + 1}", -1)
                 return True
         
@@ -319,14 +653,11 @@ class LangChainSummarizer:
 
 
     def _extract_pdf_to_markdown(self, pdf_path: Path) -> str:
-        """Estrae PDF in Markdown usando PyMuPDF4LLM."""
-        self.progress("Estrazione PDF → Markdown (PyMuPDF4LLM)...", 5)
-
-        md_text = pymupdf4llm.to_markdown(
-            str(pdf_path),
-            page_chunks=False,
-            write_images=False,
-            show_progress=False,
+        """Estrae PDF in Markdown usando PyMuPDF (fitz)."""
+        self.progress("Estrazione PDF → Markdown (PyMuPDF)...", 5)
+
+        md_text = _extract_markdown(
+            str(pdf_path), self.stats.total_pages, pdf_path.stat().st_mtime_ns
         )
 
         self.stats.total_characters_input = len(md_text)
@@ -360,13 +691,29 @@ class LangChainSummarizer:
             separators=["\n\n", "\n", ". ", " ", ""],
         )
 
-        final_chunks = []
-        for chunk in md_chunks:
-            if len(chunk.page_content) > 8000:
-                sub_chunks = text_splitter.split_documents([chunk])
-                final_chunks.extend(sub_chunks)
-            else:
-                final_chunks.append(chunk)
+        # I chunk oltre soglia vengono suddivisi con un'unica chiamata
+        # batched: il loop interno di LangChain costa molto meno di un
+        # dispatch Python per-chunk. Un indice temporaneo nei metadata
+        # (ereditato dai sotto-chunk) permette di ricostruire l'ordine.
+        final_chunks: list[Document] = []
+        large = [c for c in md_chunks if len(c.page_content) > 8000]
+        if large:
+            for i, chunk in enumerate(large):
+                chunk.metadata["_batch_idx"] = i
+            sub_by_parent: dict[int, list[Document]] = {}
+            for sub in text_splitter.split_documents(large):
+                sub_by_parent.setdefault(sub.metadata.pop("_batch_idx"), []).append(sub)
+            for chunk in large:
+                chunk.metadata.pop("_batch_idx", None)
+
+            large_idx = iter(range(len(large)))
+            for chunk in md_chunks:
+                if len(chunk.page_content) > 8000:
+                    final_chunks.extend(sub_by_parent.get(next(large_idx), []))
+                else:
+                    final_chunks.append(chunk)
+        else:
+            final_chunks = list(md_chunks)
 
         # Se non ci sono chunk, usa split diretto
         if not final_chunks:
@@ -377,8 +724,49 @@ class LangChainSummarizer:
 
         return final_chunks
 
+    def _llm_cache_key(self, prompt: str) -> str:
+        """Chiave di cache esatta su (modello, temperatura, prompt)."""
+        payload = json.dumps(
+            {
+                "model": self.settings.model_name,
+                "temperature": 0.1,
+                "prompt": prompt,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _llm_cache_get(self, key: str) -> str | None:
+        """Cerca prima in memoria, poi su disco."""
+        cached = self._llm_cache_mem.get(key)
+        if cached is not None:
+            return cached
+        path = self._llm_cache_dir / f"{key}.txt"
+        try:
+            if path.exists():
+                text = path.read_text(encoding="utf-8")
+                self._llm_cache_mem[key] = text
+                return text
+        except OSError:
+            pass
+        return None
+
+    def _llm_cache_put(self, key: str, value: str) -> None:
+        self._llm_cache_mem[key] = value
+        try:
+            self._llm_cache_dir.mkdir(parents=True, exist_ok=True)
+            (self._llm_cache_dir / f"{key}.txt").write_text(value, encoding="utf-8")
+        except OSError:
+            pass  # La cache è best-effort: senza disco si continua comunque
+
     def _call_llm_with_retry(self, prompt: str, max_retries: int = 5) -> str:
-        """Chiamata LLM con retry robusto e rotazione API key."""
+        """Chiamata LLM con retry robusto, rotazione API key e cache."""
+        cache_key = self._llm_cache_key(prompt)
+        cached = self._llm_cache_get(cache_key)
+        if cached is not None:
+            self.progress("💾 Risposta recuperata dalla cache", -1)
+            return cached
+
         total_attempts = 0
         max_total_attempts = max_retries * len(self.api_keys) if self.api_keys else max_retries
         
@@ -389,37 +777,20 @@ class LangChainSummarizer:
             self.progress(f"🔑 Usando API #{current_key_num} (key: ...{current_key[-8:] if len(current_key) > 8 else current_key})", -1)
             
             try:
+                self.rate_limiters[self.current_key_index].acquire()
                 response = self.llm.invoke(prompt)
+                if response.content:
+                    self._llm_cache_put(cache_key, response.content)
                 return response.content
             except Exception as e:
                 total_attempts += 1
                 err_str = str(e)
-                err_lower = err_str.lower()
-                
-                # Extract HTTP status code if present
-                status_code = "N/A"
-                if "429" in err_str:
-                    status_code = "429"
-                elif "403" in err_str:
-                    status_code = "403"
-                elif "400" in err_str:
-                    status_code = "400"
-                elif "500" in err_str:
-                    status_code = "500"
-                elif "503" in err_str:
-                    status_code = "503"
-                
+                status_code, is_rate_limit = _classify_api_error(e)
+
                 # Detailed error logging
                 self.progress(f"⚠️ API #{current_key_num} errore [{status_code}]: {err_str[:80]}...", -1)
-                
-                # Check if it's a rate limit error
-                is_rate_limit = (
-                    "429" in err_str or 
-                    "quota" in err_lower or 
-                    "rate" in err_lower or
-                    "resource_exhausted" in err_lower
-                )
-                
+
+
                 if is_rate_limit:
                     self.progress(f"🔒 API #{current_key_num} in rate limit (cooldown 60s)", -1)
                     self._mark_key_rate_limited(cooldown_seconds=60)
@@ -450,41 +821,151 @@ class LangChainSummarizer:
         return ""
 
 
+    async def _amap_summarize(self, chunks: list[Document]) -> list[str]:
+        """Fase MAP asincrona: un task per chunk, gated da un Semaphore.
+
+        Le chiavi circolano in una coda: ogni task ne preleva una, invoca
+        il client corrispondente con ainvoke e la restituisce; una chiave
+        in rate limit viene messa in cooldown e il chunk riprova con la
+        successiva. Le attese (cooldown, retry) sono await asyncio.sleep,
+        quindi non bloccano gli altri task in corso.
+        """
+        key_queue: asyncio.Queue[int] = asyncio.Queue()
+        for idx in range(len(self.llms)):
+            key_queue.put_nowait(idx)
+        semaphore = asyncio.Semaphore(len(self.llms))
+
+        async def summarize_one(chunk: Document) -> str:
+            async with semaphore:
+                for attempt in range(5):
+                    key_idx = await key_queue.get()
+                    try:
+                        wait = self.key_cooldowns.get(key_idx, 0) - time.time()
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                        await self.rate_limiters[key_idx].acquire_async()
+                        response = await self.llms[key_idx].ainvoke(
+                            INITIAL_PROMPT.format(text=chunk.page_content)
+                        )
+                        return response.content
+                    except Exception as e:
+                        _, is_rate_limit = _classify_api_error(e)
+                        if is_rate_limit:
+                            self.key_cooldowns[key_idx] = time.time() + 60
+                        elif attempt == 4:
+                            raise
+                        else:
+                            await asyncio.sleep(5)
+                    finally:
+                        key_queue.put_nowait(key_idx)
+                raise RuntimeError("Numero massimo di tentativi raggiunto (fase MAP)")
+
+        return list(await asyncio.gather(*(summarize_one(c) for c in chunks)))
+
+    def _map_summarize(self, chunks: list[Document]) -> list[str]:
+        """Fase MAP: riassunto iniziale di ogni chunk, in parallelo sulle chiavi.
+
+        Entry point sincrono: avvia l'event loop della fase MAP asincrona.
+        """
+        partials = asyncio.run(self._amap_summarize(chunks))
+        self.stats.api_calls += len(chunks)
+        return partials
+
     def _refine_summarize(self, chunks: list[Document]) -> str:
-        """Summarization con strategia REFINE (legacy, per documenti enormi)."""
+        """Summarization MAP-REDUCE (per documenti enormi).
+
+        Il riassunto iniziale di ogni chunk è indipendente dagli altri e
+        viene distribuito sulle API key disponibili; solo l'integrazione
+        finale resta sequenziale (ogni passo dipende dal precedente).
+        """
         self.progress("Avvio summarization REFINE...", 25)
 
         if not chunks:
             return "Nessun contenuto da elaborare."
 
-        # Primo chunk: genera riassunto iniziale
-        self.progress(f"Elaborazione chunk 1/{len(chunks)}...", 30)
-
-        current_summary = self._call_llm_with_retry(
-            INITIAL_PROMPT.format(text=chunks[0].page_content)
+        # Fase MAP: riassunti iniziali in parallelo
+        self.progress(
+            f"Fase MAP: {len(chunks)} chunk su {max(1, len(self.llms))} API key...", 30
         )
-        self.stats.api_calls += 1
+        partials = self._map_summarize(chunks) if self.llms else [
+            self._call_llm_with_retry(INITIAL_PROMPT.format(text=c.page_content))
+            for c in chunks
+        ]
 
-        # Refine con i chunk successivi
-        for i, chunk in enumerate(chunks[1:], start=2):
-            progress_pct = 30 + int((i / len(chunks)) * 50)
-            self.progress(f"Raffinamento chunk {i}/{len(chunks)}...", progress_pct)
+        # Fase REDUCE: integrazione sequenziale dei riassunti parziali
+        current_summary = partials[0]
+        for i, partial in enumerate(partials[1:], start=2):
+            progress_pct = 30 + int((i / len(partials)) * 50)
+            self.progress(f"Raffinamento chunk {i}/{len(partials)}...", progress_pct)
 
-            refined = self._call_llm_with_retry(
+            current_summary = self._call_llm_with_retry(
                 REFINE_PROMPT.format(
                     existing_answer=current_summary,
-                    text=chunk.page_content
+                    text=partial
                 )
             )
-            current_summary = refined
             self.stats.api_calls += 1
 
-            # Pausa per rate limit
-            time.sleep(1)
-
         self.progress("Summarization completata", 80)
         return current_summary
 
+    def _iter_page_batches(self, pdf_path: Path, batch_pages: int = 500):
+        """Genera frammenti markdown a batch di pagine.
+
+        Per documenti enormi evita di materializzare l'intero markdown in
+        memoria: ogni batch viene estratto, consegnato al chiamante e può
+        essere raccolto dal GC prima del successivo. La mediana dei font
+        (per gli heading) è calcolata per batch: su centinaia di pagine è
+        un'approssimazione più che adeguata.
+        """
+        n_pages = self.stats.total_pages
+
+        for start in range(0, n_pages, batch_pages):
+            stop = min(start + batch_pages, n_pages)
+            yield _assemble_markdown(
+                _extract_page_range(str(pdf_path), start, stop)
+            )
+
+    def _streaming_summarize(self, pdf_path: Path) -> str:
+        """Summarization REFINE in streaming su batch di pagine.
+
+        La memoria resta limitata a un batch alla volta: ogni frammento
+        viene diviso in chunk e integrato subito nel riassunto corrente.
+        I contatori (caratteri, chunk) sono accumulati incrementalmente,
+        senza mai costruire la stringa completa del documento.
+        """
+        self.progress("Avvio summarization REFINE in streaming...", 25)
+
+        current_summary: str | None = None
+        total_chunks = 0
+        total_chars = 0
+
+        for batch_num, fragment in enumerate(self._iter_page_batches(pdf_path), start=1):
+            total_chars += len(fragment)
+            self.progress(f"Batch {batch_num}: {len(fragment):,} caratteri estratti", 25)
+
+            for chunk in self._split_into_chunks(fragment):
+                total_chunks += 1
+                if current_summary is None:
+                    current_summary = self._call_llm_with_retry(
+                        INITIAL_PROMPT.format(text=chunk.page_content)
+                    )
+                else:
+                    self.progress(f"Raffinamento chunk {total_chunks}...", 40)
+                    current_summary = self._call_llm_with_retry(
+                        REFINE_PROMPT.format(
+                            existing_answer=current_summary,
+                            text=chunk.page_content,
+                        )
+                    )
+                self.stats.api_calls += 1
+
+        self.stats.total_chunks = total_chunks
+        self.stats.total_characters_input = total_chars
+
+        self.progress("Summarization completata", 80)
+        return current_summary or "Nessun contenuto da elaborare."
+
     def _stuff_summarize(self, markdown_text: str) -> str:
         """
         Summarization con strategia STUFF - singola chiamata API.
@@ -508,11 +989,14 @@ class LangChainSummarizer:
         
         self.progress("🚀 Modalità STUFF: elaborazione documento completo...", 30)
         self.progress("⏳ Singola chiamata API in corso (può richiedere 1-3 minuti)...", 35)
-        
-        # Singola chiamata con tutto il documento
-        summary = self._call_llm_with_retry(
-            STUFF_PROMPT.format(text=markdown_text)
-        )
+
+        # Singola chiamata con tutto il documento; se disponibile, il prefisso
+        # statico del prompt viene riusato lato server (context caching)
+        summary = self._stuff_call_with_cached_prefix(markdown_text)
+        if summary is None:
+            summary = self._call_llm_with_retry(
+                STUFF_PROMPT.format(text=markdown_text)
+            )
         self.stats.api_calls += 1
         self.stats.total_chunks = 1  # STUFF = 1 "chunk" logico
         
@@ -520,10 +1004,99 @@ class LangChainSummarizer:
         return summary
 
 
-    def _convert_to_latex(self, summary: str, title: str) -> str:
-        """Converte il riassunto in LaTeX professionale."""
-        self.progress("Conversione in LaTeX...", 85)
+    def _get_cached_stuff_model(self):
+        """Modello Gemini con il prefisso STUFF cacheato lato server.
+
+        Best effort: ritorna None se il context caching non è utilizzabile
+        (prefisso sotto la soglia minima di token dell'API, SDK datato,
+        nessuna chiave configurata) e si ricade sul prompt completo.
+        """
+        if self._cached_stuff_tried:
+            return self._cached_stuff_model
+        self._cached_stuff_tried = True
+
+        if not self.api_keys:
+            return None
+
+        try:
+            template = STUFF_PROMPT.template
+            prefix = template[: template.index(_STUFF_SPLIT_MARKER)]
+            genai.configure(
+                api_key=self.api_keys[self.current_key_index],
+                transport="rest",
+            )
+            cached = genai.caching.CachedContent.create(
+                model=self.settings.model_name,
+                system_instruction=prefix,
+                ttl="600s",
+            )
+            self._cached_stuff_model = genai.GenerativeModel.from_cached_content(
+                cached
+            )
+        except Exception:
+            self._cached_stuff_model = None
+        return self._cached_stuff_model
+
+    def _stuff_call_with_cached_prefix(self, markdown_text: str) -> str | None:
+        """Chiamata STUFF con solo la coda dinamica del prompt, se possibile."""
+        model = self._get_cached_stuff_model()
+        if model is None:
+            return None
+        try:
+            template = STUFF_PROMPT.template
+            tail = template[template.index(_STUFF_SPLIT_MARKER):]
+            response = model.generate_content(tail.format(text=markdown_text))
+            return response.text or None
+        except Exception:
+            return None
+
+    # Caratteri di riassunto per singola chiamata di conversione: ben sotto
+    # il tetto di 65536 token di output, per evitare troncamenti
+    _LLM_SECTION_CHARS = 24_000
+
+    def _split_summary_sections(self, summary: str) -> list[str]:
+        """Divide il riassunto in sezioni per la conversione parallela.
+
+        Qui si arriva solo per riassunti senza heading markdown (quelli
+        con heading prendono il percorso deterministico), quindi lo
+        split è a blocchi di paragrafi di dimensione limitata.
+        """
+        blocks: list[str] = []
+        current: list[str] = []
+        size = 0
+        for para in summary.split("\n\n"):
+            if size and size + len(para) > self._LLM_SECTION_CHARS:
+                blocks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(para)
+            size += len(para) + 2
+        if current:
+            blocks.append("\n\n".join(current))
+        return blocks or [summary]
+
+    def _llm_convert_to_latex(self, summary: str) -> str:
+        """Conversione LaTeX via LLM, per riassunti senza heading markdown.
+
+        I riassunti lunghi vengono divisi in sezioni convertite in
+        parallelo sulle API key disponibili e ricombinate in ordine:
+        ogni chiamata resta sotto il tetto di token di output e il
+        wallclock scala con il numero di chiavi.
+        """
+        sections = self._split_summary_sections(summary)
+        if len(sections) == 1:
+            self.progress("Conversione in LaTeX (via modello)...", 85)
+            return self._llm_convert_section(sections[0])
 
+        self.progress(
+            f"Conversione in LaTeX: {len(sections)} sezioni in parallelo...", 85
+        )
+        with ThreadPoolExecutor(max_workers=max(1, len(self.api_keys))) as executor:
+            # executor.map preserva l'ordine delle sezioni
+            parts = list(executor.map(self._llm_convert_section, sections))
+        return "\n\n".join(parts)
+
+    def _llm_convert_section(self, summary: str) -> str:
+        """Converte una singola sezione di riassunto in LaTeX via LLM."""
         conversion_prompt = f"""Converti questo riassunto in contenuto LaTeX.
 
 IMPORTANTE:
@@ -544,21 +1117,122 @@ CONTENUTO LATEX:"""
 
         latex_content = self._call_llm_with_retry(conversion_prompt)
         self.stats.api_calls += 1
+        return _strip_md_fence(latex_content.strip())
+
+    def _convert_to_latex(self, summary: str, title: str) -> str:
+        """Converte il riassunto in LaTeX professionale.
 
-        # Pulisci eventuali artefatti
-        latex_content = latex_content.strip()
-        if latex_content.startswith("```"):
-            lines = latex_content.split("\n")
-            latex_content = "\n".join(lines[1:-1] if lines[-1].startswith("```") else lines[1:])
+        I marker emoji e gli heading markdown del riassunto hanno un
+        formato fisso imposto dai prompt, quindi la conversione è locale
+        e deterministica: zero chiamate API, zero latenza, zero rischio
+        rate limit. L'LLM resta come fallback solo per riassunti privi
+        di struttura markdown riconoscibile (serve inferenza dei titoli).
+        """
+        if _MD_ANY_HEADING_RE.search(summary):
+            self.progress("Conversione in LaTeX (locale, deterministica)...", 85)
+            latex_content = _markdown_to_latex_body(summary)
+        else:
+            latex_content = self._llm_convert_to_latex(summary)
 
-        # Costruisci documento completo
-        full_latex = LATEX_TEMPLATE.replace("%TITLE%", title).replace(
-            "%CONTENT%", latex_content
+        # Costruisci documento completo (una sola scansione del template);
+        # il titolo arriva dal nome file e va escapato come il corpo
+        full_latex = _LATEX_TEMPLATE_SUB.substitute(
+            TITLE=_escape_latex(title), CONTENT=latex_content
         )
 
         self.stats.total_characters_output = len(full_latex)
         return full_latex
 
+    @cached_property
+    def _latex_compiler(self) -> tuple[str, str, list[str], bool] | None:
+        """Compilatore LaTeX disponibile: (path, nome, argomenti, doppio passaggio).
+
+        La scansione di $PATH avviene una sola volta per processo invece
+        che a ogni compilazione; None se non c'è alcun compilatore.
+        """
+        import shutil
+
+        pdflatex_path = shutil.which("pdflatex")
+        if pdflatex_path:
+            return (
+                pdflatex_path,
+                "pdflatex",
+                ["-interaction=nonstopmode", "-halt-on-error"],
+                True,
+            )
+        tectonic_path = shutil.which("tectonic")
+        if tectonic_path:
+            # Tectonic fa tutto in un passaggio
+            return tectonic_path, "tectonic", ["--keep-logs"], False
+        return None
+
+    def _lint_latex(self, latex_content: str, filename: str) -> str:
+        """Pre-lint locale con chktex, se installato.
+
+        Intercetta i problemi più comuni prima della prima compilazione,
+        a costo zero in chiamate API; restituisce stringa vuota se chktex
+        non è disponibile o fallisce.
+        """
+        import shutil
+        import subprocess
+        import tempfile
+
+        chktex = shutil.which("chktex")
+        if not chktex:
+            return ""
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_tex = Path(temp_dir) / f"{filename}.tex"
+                temp_tex.write_text(latex_content, encoding="utf-8")
+                result = subprocess.run(
+                    [chktex, "-q", temp_tex.name],
+                    cwd=temp_dir,
+                    capture_output=True,
+                    text=True,
+                    timeout=60,
+                )
+                return result.stdout[-2000:]
+        except Exception:
+            return ""
+
+    def _llm_fix_candidates(
+        self, latex: str, error_log: str, lint_report: str
+    ) -> list[str]:
+        """Chiede al modello più correzioni alternative in una sola chiamata.
+
+        Restituisce fino a 3 candidati da provare senza ulteriori roundtrip;
+        se la risposta non è JSON valido viene trattata come candidato unico.
+        """
+        lint_section = (
+            f"\nSEGNALAZIONI CHKTEX:\n{lint_report}\n" if lint_report else ""
+        )
+        fix_prompt = f"""Il seguente codice LaTeX ha errori di compilazione. Proponi 3 varianti corrette COMPLETE del codice.
+
+Rispondi SOLO con JSON nel formato: {{"candidates": ["<latex 1>", "<latex 2>", "<latex 3>"]}}
+
+ERRORI DI COMPILAZIONE:
+{error_log[-3000:]}
+{lint_section}
+CODICE LATEX CON ERRORI:
+{latex}
+
+JSON:"""
+
+        response = _strip_md_fence(self._call_llm_with_retry(fix_prompt).strip())
+        self.stats.api_calls += 1
+        try:
+            data = _json_loads(response)
+            candidates = [
+                _strip_md_fence(c.strip())
+                for c in data.get("candidates", [])
+                if isinstance(c, str) and c.strip()
+            ]
+            if candidates:
+                return candidates[:3]
+        except Exception:
+            pass
+        return [response]
+
     def compile_latex_to_pdf(self, latex_content: str, output_dir: Path, filename: str, max_fix_attempts: int = 3) -> tuple[bool, str]:
         """
         Compila LaTeX in PDF usando pdflatex.
@@ -570,34 +1244,49 @@ CONTENUTO LATEX:"""
         import subprocess
         import shutil
         import tempfile
-        
-        # Cerca compilatore LaTeX: pdflatex o tectonic
-        pdflatex_path = shutil.which("pdflatex")
-        tectonic_path = shutil.which("tectonic")
-        
-        if pdflatex_path:
-            compiler = pdflatex_path
-            compiler_name = "pdflatex"
-            compiler_args = ["-interaction=nonstopmode", "-halt-on-error"]
-            needs_double_pass = True
-        elif tectonic_path:
-            compiler = tectonic_path
-            compiler_name = "tectonic"
-            compiler_args = ["--keep-logs"]  # Tectonic fa tutto in un passaggio
-            needs_double_pass = False
-        else:
+
+        # Cache su disco dei PDF già compilati, indicizzata sul contenuto:
+        # LaTeX identico → PDF identico, senza rilanciare il compilatore
+        pdf_key = hashlib.sha256(latex_content.encode("utf-8")).hexdigest()
+        cached_pdf = self._llm_cache_dir / f"{pdf_key}.pdf"
+        try:
+            if cached_pdf.exists():
+                final_pdf = output_dir / f"{filename}.pdf"
+                shutil.copy(cached_pdf, final_pdf)
+                self.progress("💾 PDF recuperato dalla cache (LaTeX invariato)", 95)
+                return True, str(final_pdf)
+        except OSError:
+            pass  # La cache è best-effort: senza disco si compila comunque
+
+        if self._latex_compiler is None:
             return False, "❌ Nessun compilatore LaTeX trovato. Installa:\n• brew install tectonic (consigliato, ~200MB)\n• brew install --cask mactex (completo, ~4GB)"
-        
+        compiler, compiler_name, compiler_args, needs_double_pass = self._latex_compiler
+
         self.progress(f"📄 Compilazione LaTeX → PDF ({compiler_name})...", 90)
         
         current_latex = latex_content
-        
+
+        # Pre-lint locale: le segnalazioni arricchiscono l'eventuale prompt
+        # di correzione senza consumare compilazioni né chiamate API
+        lint_report = self._lint_latex(current_latex, filename)
+        fix_candidates: list[str] = []
+
         for attempt in range(max_fix_attempts):
-            # Crea directory temporanea per la compilazione
-            with tempfile.TemporaryDirectory() as temp_dir:
+            # Crea directory temporanea per la compilazione, accanto alla
+            # directory di output: stesso filesystem → il PDF finale si
+            # sposta con un rename atomico invece di una copia integrale
+            try:
+                temp_ctx = tempfile.TemporaryDirectory(dir=output_dir.parent)
+            except OSError:
+                temp_ctx = tempfile.TemporaryDirectory()
+            with temp_ctx as temp_dir:
                 temp_tex = Path(temp_dir) / f"{filename}.tex"
-                temp_tex.write_text(current_latex, encoding="utf-8")
-                
+                # Scrittura raw bytes: salta il layer testo (codec
+                # incrementale, traduzione newline) su sorgenti multi-MB
+                with open(temp_tex, "wb") as f:
+                    f.write(current_latex.encode("utf-8"))
+
+
                 try:
                     # Esegui compilatore
                     passes = 2 if needs_double_pass else 1
@@ -613,16 +1302,34 @@ CONTENUTO LATEX:"""
                     # Controlla se il PDF è stato creato
                     temp_pdf = Path(temp_dir) / f"{filename}.pdf"
                     if temp_pdf.exists():
-                        # Successo! Copia il PDF nella directory di output
+                        # Successo! Popola la cache, poi sposta il PDF
+                        # nella directory di output (rename O(1) sullo
+                        # stesso filesystem, copia solo se cross-device)
                         final_pdf = output_dir / f"{filename}.pdf"
-                        shutil.copy(temp_pdf, final_pdf)
+                        try:
+                            self._llm_cache_dir.mkdir(parents=True, exist_ok=True)
+                            shutil.copy(temp_pdf, cached_pdf)
+                        except OSError:
+                            pass
+                        try:
+                            os.replace(temp_pdf, final_pdf)
+                        except OSError:
+                            shutil.copy(temp_pdf, final_pdf)
                         self.progress("✅ PDF compilato con successo!", 95)
                         return True, str(final_pdf)
                     
-                    # Estrai errori dal log
+                    # Estrai errori dal log: serve solo la coda, quindi
+                    # lettura O(1) degli ultimi KB invece dell'intero file
                     log_file = Path(temp_dir) / f"{filename}.log"
-                    error_log = log_file.read_text(encoding="utf-8", errors="ignore") if log_file.exists() else result.stdout + result.stderr
-                    
+                    if log_file.exists():
+                        with open(log_file, "rb") as f:
+                            f.seek(0, 2)
+                            f.seek(max(0, f.tell() - 3000))
+                            error_log = f.read().decode("utf-8", errors="ignore")
+                    else:
+                        error_log = result.stdout + result.stderr
+
+
                 except subprocess.TimeoutExpired:
                     error_log = "Timeout: la compilazione ha impiegato troppo tempo."
                 except Exception as e:
@@ -631,25 +1338,15 @@ CONTENUTO LATEX:"""
             # Se siamo qui, c'è stato un errore
             if attempt < max_fix_attempts - 1:
                 self.progress(f"⚠️ Errore compilazione (tentativo {attempt + 1}/{max_fix_attempts}). Correzione AI...", -1)
-                
-                # Usa l'AI per correggere gli errori
-                fix_prompt = f"""Il seguente codice LaTeX ha errori di compilazione. Correggili e restituisci SOLO il codice LaTeX corretto completo.
-
-ERRORI DI COMPILAZIONE:
-{error_log[-3000:]}
-
-CODICE LATEX CON ERRORI:
-{current_latex}
 
-CODICE LATEX CORRETTO (solo codice, nessun commento):"""
-                
-                current_latex = self._call_llm_with_retry(fix_prompt)
-                self.stats.api_calls += 1
-                
-                # Pulisci eventuali markdown
-                if current_latex.startswith("```"):
-                    lines = current_latex.split("\n")
-                    current_latex = "\n".join(lines[1:-1] if lines[-1].startswith("```") else lines[1:])
+                # Una sola chiamata produce più correzioni alternative: i
+                # tentativi successivi consumano i candidati rimasti senza
+                # nuovi roundtrip verso il modello
+                if not fix_candidates:
+                    fix_candidates = self._llm_fix_candidates(
+                        current_latex, error_log, lint_report
+                    )
+                current_latex = fix_candidates.pop(0)
             else:
                 # Ultimo tentativo fallito
                 self.progress("❌ Impossibile correggere gli errori LaTeX", -1)
@@ -672,18 +1369,23 @@ CODICE LATEX CORRETTO (solo codice, nessun commento):"""
         import fitz
 
         with fitz.open(pdf_path) as doc:
-            self.stats.total_pages = len(doc)
+            self.stats.total_pages = doc.page_count  # attributo O(1)
 
         self.progress(f"Elaborazione: {pdf_path.name} ({self.stats.total_pages} pagine)", 0)
 
-        # === FASE 1: Estrazione ===
-        markdown_text = self._extract_pdf_to_markdown(pdf_path)
+        # === FASE 1 + 2: Estrazione e Summarization ===
+        if self.stats.total_pages > self.STREAM_PAGE_THRESHOLD:
+            # Documento enorme: estrazione e REFINE in streaming a batch di
+            # pagine, senza mai materializzare il markdown completo
+            self.progress("📚 Strategia: REFINE streaming (batch di pagine)", 20)
+            summary = self._streaming_summarize(pdf_path)
+        else:
+            markdown_text = self._extract_pdf_to_markdown(pdf_path)
 
-        # === FASE 2: Summarization STUFF (singola chiamata) ===
-        # STUFF mode usa il context window da 1M token per zero perdite
-        # Fallback automatico a REFINE per documenti > 800k token
-        self.progress("📚 Strategia: STUFF (documento completo, zero perdite)", 20)
-        summary = self._stuff_summarize(markdown_text)
+            # STUFF mode usa il context window da 1M token per zero perdite
+            # Fallback automatico a REFINE per documenti > 800k token
+            self.progress("📚 Strategia: STUFF (documento completo, zero perdite)", 20)
+            summary = self._stuff_summarize(markdown_text)
 
         # Salva riassunto intermedio (testo)
         summary_txt_path = output_dir / f"{pdf_path.stem}_riassunto.txt"
@@ -715,7 +1417,7 @@ CODICE LATEX CORRETTO (solo codice, nessun commento):"""
         }
 
         stats_path = output_dir / f"{pdf_path.stem}_stats.json"
-        stats_path.write_text(json.dumps(stats_dict, indent=2), encoding="utf-8")
+        stats_path.write_text(_json_dumps(stats_dict), encoding="utf-8")
 
         self.progress("Completato!", 100)
 
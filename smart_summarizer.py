@@ -31,19 +31,58 @@ ARCHITETTURA:
 
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import re
 import time
 from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from dataclasses import dataclass, field
+from io import StringIO
+from itertools import chain
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterator
 
 import fitz
 import google.generativeai as genai
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+try:
+    # Automa Aho-Corasick per la verifica coverage in una sola passata
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    # Serializzatore JSON più rapido per i file intermedi, se disponibile
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _write_json(path: Path, data: dict, pretty: bool = False) -> None:
+    """Scrive un sidecar JSON.
+
+    orjson se installato, altrimenti stdlib; i file intermedi vanno
+    compatti, pretty=True solo per quelli destinati alla lettura umana.
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        path.write_bytes(orjson.dumps(data, option=option))
+    elif pretty:
+        path.write_text(
+            json.dumps(data, indent=2, ensure_ascii=False),
+            encoding="utf-8"
+        )
+    else:
+        path.write_text(
+            json.dumps(data, separators=(',', ':'), ensure_ascii=False),
+            encoding="utf-8"
+        )
+
 
 # =============================================================================
 # CONFIGURATION
@@ -54,6 +93,10 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
     gemini_api_key: str = Field(default="", alias="GEMINI_API_KEY")
     model_name: str = Field(default="gemini-2.5-flash", alias="GEMINI_MODEL")
+    # Processi per l'estrazione pagine; 0 = automatico (core - 1)
+    extraction_workers: int = Field(default=0, alias="EXTRACTION_WORKERS")
+    # Chiamate API concorrenti nella fase di elaborazione sezioni
+    api_concurrency: int = Field(default=4, alias="API_CONCURRENCY")
 
 
 # =============================================================================
@@ -69,6 +112,12 @@ class ExtractedTerm:
     context: str
     page: int
     frequency: int = 1
+    # Forma minuscola calcolata una volta: frequenze e coverage la
+    # rileggono senza riallocare la stringa a ogni fase
+    term_lower: str = field(init=False)
+
+    def __post_init__(self):
+        self.term_lower = self.term.lower()
 
 
 @dataclass
@@ -80,6 +129,9 @@ class DocumentSection:
     text: str
     subsections: list[str] = field(default_factory=list)
     extracted_terms: list[ExtractedTerm] = field(default_factory=list)
+    # Vista per tipo (law/definition/concept → termini), popolata in
+    # estrazione: evita di rifiltrare extracted_terms a ogni consumo
+    terms_by_type: dict[str, list[str]] = field(default_factory=dict)
 
 
 @dataclass
@@ -98,14 +150,51 @@ class DocumentAnalysis:
 # =============================================================================
 
 
+def _extract_one_page(args: tuple[str, int]) -> tuple[int, str]:
+    """Worker di estrazione: apre il proprio documento (fitz non è
+    condivisibile tra processi) e ritorna (numero pagina, testo)."""
+    pdf_path, page_num = args
+    with fitz.open(pdf_path) as doc:
+        return page_num + 1, doc[page_num].get_text("text")
+
+
+def _build_combined_term_re(
+    spec: tuple[tuple[str, list[re.Pattern]], ...],
+) -> tuple[re.Pattern, dict[int, tuple[str, int | None]]]:
+    """Fonde i pattern in un'unica alternation con gruppi nominati.
+
+    Una sola scansione del testo al posto di una per pattern. Ritorna la
+    regex combinata e una mappa numero di gruppo → (tipo di termine,
+    numero del primo gruppo interno del ramo, o None se il ramo non
+    cattura nulla): match.lastindex cade sempre in uno di questi gruppi.
+    """
+    parts = [
+        f"(?P<{kind}_{i}>{p.pattern})"
+        for kind, patterns in spec
+        for i, p in enumerate(patterns)
+    ]
+    combined = re.compile("|".join(parts), re.IGNORECASE)
+
+    group_map: dict[int, tuple[str, int | None]] = {}
+    branches = sorted(combined.groupindex.items(), key=lambda kv: kv[1])
+    for pos, (name, start) in enumerate(branches):
+        end = branches[pos + 1][1] if pos + 1 < len(branches) else combined.groups + 1
+        kind = name.rsplit("_", 1)[0]
+        inner = start + 1 if end > start + 1 else None
+        for group_num in range(start, end):
+            group_map[group_num] = (kind, inner)
+    return combined, group_map
+
+
 class LocalAnalyzer:
     """
     Analizzatore locale che estrae TUTTO dal documento senza chiamate API.
     Usa pattern matching, regex e euristiche per identificare struttura e contenuti.
     """
 
-    # Pattern per riferimenti normativi italiani
-    LAW_PATTERNS = [
+    # Pattern per riferimenti normativi italiani (compilati una volta a
+    # definizione classe: niente lookup nella cache di re a ogni chiamata)
+    LAW_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
         r'[Aa]rt(?:icolo)?\.?\s*(\d+(?:\s*[-,]\s*\d+)*)',
         r'[Ll](?:egge)?\.?\s*(?:n\.?\s*)?(\d+/\d{4})',
         r'[Dd]\.?\s*[Ll]gs\.?\s*(?:n\.?\s*)?(\d+/\d{4})',
@@ -117,67 +206,99 @@ class LocalAnalyzer:
         r'[Cc]ostituzione',
         r'GDPR',
         r'[Tt]rattato\s+(?:UE|CE|CEE)',
-    ]
+    )]
 
     # Pattern per definizioni
-    DEFINITION_PATTERNS = [
+    DEFINITION_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
         r'(?:si\s+)?(?:intende|definisce|significa)\s+(?:per|come|con)\s+["\']?([^"\',.;:]+)["\']?',
         r'(?:è|sono)\s+(?:definit[oaie]|considerat[oaie])\s+(?:come\s+)?["\']?([^"\',.;:]+)',
         r'["\']([^"\']+)["\']\s*(?:significa|indica|è)',
         r'(?:per|con)\s+["\']([^"\']+)["\']\s+si\s+intende',
         r'(?:il\s+termine|la\s+nozione\s+di)\s+["\']?([^"\',.;:]+)["\']?',
-    ]
+    )]
 
     # Pattern per concetti chiave
-    CONCEPT_PATTERNS = [
+    CONCEPT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
         r'(?:principio|criterio|requisito)\s+(?:di|del(?:la)?)\s+([a-zA-Zàèìòùé\s]+)',
         r'(?:diritto|obbligo|dovere|facoltà)\s+(?:di|a|del(?:la)?)\s+([a-zA-Zàèìòùé\s]+)',
         r'(?:tutela|protezione|garanzia)\s+(?:del(?:la)?|dei|delle)\s+([a-zA-Zàèìòùé\s]+)',
-    ]
+    )]
 
-    # Pattern per struttura documento
-    HEADING_PATTERNS = [
+    # Pattern per struttura documento. Niente \s prima di $ (include i
+    # newline e backtracka in modo quadratico sulle righe lunghe dei PDF):
+    # solo spazi/tab espliciti e ripetizioni con limite superiore
+    HEADING_PATTERNS = [re.compile(p, re.MULTILINE) for p in (
         r'^(?:CAPITOLO|CAPO|TITOLO|PARTE|SEZIONE)\s+[IVXLCDM\d]+',
         r'^(?:Cap(?:itolo)?\.?|Sez(?:ione)?\.?)\s*\d+',
-        r'^\d+(?:\.\d+)*\s+[A-Z][A-Za-zàèìòùé\s]+$',
-        r'^[A-Z][A-Z\s]{5,}$',  # Titoli tutto maiuscolo
+        r'^\d+(?:\.\d+){0,5}[ \t]+[A-Z][A-Za-zàèìòùé ]{0,120}$',
+        r'^[A-Z][A-Z ]{5,120}$',  # Titoli tutto maiuscolo
+    )]
+
+    # Euristica per heading numerati ("1. Titolo")
+    NUMBERED_HEADING_RE = re.compile(r'^\d+\.\s+[A-Z]')
+
+    # Alternation fusa per categoria: una passata sul testo per tipo di
+    # termine invece di una per pattern. Le categorie restano su passate
+    # separate perché i loro match possono sovrapporsi (es. un concetto
+    # greedy che ingloba un riferimento normativo)
+    COMBINED_TERM_RES = [
+        _build_combined_term_re((("law", LAW_PATTERNS),)),
+        _build_combined_term_re((("definition", DEFINITION_PATTERNS),)),
+        _build_combined_term_re((("concept", CONCEPT_PATTERNS),)),
     ]
 
-    def __init__(self, progress_callback: Callable[[str, int], None] | None = None):
+    # Sotto questa soglia il fork dei worker costa più dell'estrazione
+    PARALLEL_PAGE_THRESHOLD = 8
+
+    def __init__(
+        self,
+        progress_callback: Callable[[str, int], None] | None = None,
+        workers: int = 0,
+    ):
         self.progress = progress_callback or (lambda m, p: None)
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        # Ordine di prova dei pattern heading, auto-adattivo (move-to-front):
+        # nei documenti con stile di titolo omogeneo il pattern giusto
+        # finisce in testa e il match medio costa ~1 tentativo
+        self._heading_order = list(range(len(self.HEADING_PATTERNS)))
 
     def analyze_document(self, pdf_path: Path) -> DocumentAnalysis:
         """Analisi completa del documento - ZERO API calls."""
         self.progress("Fase 1: Analisi locale del documento...", 5)
 
-        # Estrai tutto il testo con metadati
-        pages_data = self._extract_pages(pdf_path)
-        total_pages = len(pages_data)
-
-        self.progress(f"Estratte {total_pages} pagine", 10)
+        # Estrai il testo in streaming: solo la prima pagina viene
+        # trattenuta (serve per il titolo), il resto fluisce direttamente
+        # nell'identificazione delle sezioni senza materializzare il PDF
+        pages_iter = self._iter_pages(pdf_path)
+        first = next(pages_iter, None)
+        title = self._detect_title([first] if first else [])
 
         # Identifica struttura
-        self.progress("Identificazione struttura documento...", 15)
-        sections = self._identify_sections(pages_data)
+        self.progress("Identificazione struttura documento...", 10)
+        sections = self._identify_sections(
+            chain([first], pages_iter) if first else iter(())
+        )
+        total_pages = sections[-1].end_page if sections else 0
 
-        # Estrai termini da ogni sezione
+        self.progress(f"Estratte {total_pages} pagine", 15)
+
+        # Estrai termini da ogni sezione, aggiornando le frequenze man mano:
+        # niente seconda passata su all_terms a fine estrazione
         self.progress("Estrazione termini e concetti...", 25)
         all_terms = []
+        term_freq: Counter[str] = Counter()
         for i, section in enumerate(sections):
             pct = 25 + int((i / len(sections)) * 20)
             self.progress(f"Analisi sezione: {section.title[:40]}...", pct)
-            section.extracted_terms = self._extract_terms(section.text, section.start_page)
+            section.extracted_terms, section.terms_by_type = self._extract_terms(
+                section.text, section.start_page
+            )
             all_terms.extend(section.extracted_terms)
-
-        # Calcola frequenze
-        term_freq = Counter(t.term.lower() for t in all_terms)
+            term_freq.update(t.term_lower for t in section.extracted_terms)
 
         # Genera summary struttura
         structure_summary = self._generate_structure_summary(sections, all_terms)
 
-        # Identifica titolo documento
-        title = self._detect_title(pages_data)
-
         self.progress("Analisi locale completata", 45)
 
         return DocumentAnalysis(
@@ -189,47 +310,85 @@ class LocalAnalyzer:
             structure_summary=structure_summary
         )
 
-    def _extract_pages(self, pdf_path: Path) -> list[tuple[int, str]]:
-        """Estrai testo pagina per pagina."""
-        pages = []
+    def _iter_pages(self, pdf_path: Path) -> Iterator[tuple[int, str]]:
+        """Estrai testo pagina per pagina, in streaming.
+
+        Generatore: tiene in RAM una pagina alla volta invece dell'intero
+        PDF. Sui documenti lunghi l'estrazione resta parallela (imap
+        restituisce i risultati in ordine man mano che i worker finiscono).
+        """
         with fitz.open(pdf_path) as doc:
-            for i, page in enumerate(doc, 1):
-                text = page.get_text("text")
+            n_pages = doc.page_count
+            if n_pages < self.PARALLEL_PAGE_THRESHOLD or self.workers <= 1:
+                for i, page in enumerate(doc, 1):
+                    text = page.get_text("text")
+                    if text.strip():
+                        yield (i, text)
+                return
+
+        with Pool(processes=self.workers) as pool:
+            for num, text in pool.imap(
+                _extract_one_page,
+                [(str(pdf_path), i) for i in range(n_pages)],
+                chunksize=16,
+            ):
                 if text.strip():
-                    pages.append((i, text))
-        return pages
+                    yield (num, text)
 
-    def _identify_sections(self, pages: list[tuple[int, str]]) -> list[DocumentSection]:
+    def _identify_sections(
+        self, pages: Iterator[tuple[int, str]]
+    ) -> list[DocumentSection]:
         """Identifica sezioni logiche del documento."""
         sections = []
         current_section = None
-        current_text = []
+        # Buffer C-level: evita di accumulare decine di migliaia di piccole
+        # stringhe Python per poi rifonderle con join a ogni confine di sezione
+        current_buf = StringIO()
         current_start = 1
+        last_page_num = 0
 
         for page_num, text in pages:
+            last_page_num = page_num
             lines = text.split('\n')
 
             for line in lines:
                 line_stripped = line.strip()
 
+                # Fast path: sia i pattern che le euristiche pretendono una
+                # maiuscola o una cifra iniziale, e nessun titolo plausibile
+                # supera i 200 caratteri. Il grosso delle righe di corpo
+                # viene accodato qui senza mai toccare regex o isupper
+                first = line_stripped[:1]
+                if (
+                    not first
+                    or not (first.isupper() or first.isdigit())
+                    or len(line_stripped) > 200
+                ):
+                    current_buf.write(line)
+                    current_buf.write('\n')
+                    continue
+
                 # Verifica se è un heading
                 is_heading = False
-                for pattern in self.HEADING_PATTERNS:
-                    if re.match(pattern, line_stripped, re.MULTILINE):
+                order = self._heading_order
+                for pos, k in enumerate(order):
+                    if self.HEADING_PATTERNS[k].match(line_stripped):
                         is_heading = True
+                        if pos:
+                            order[0], order[pos] = order[pos], order[0]
                         break
 
                 # Euristica: linea corta, tutto maiuscolo o con numero iniziale
                 if not is_heading and len(line_stripped) < 80:
                     if line_stripped.isupper() and len(line_stripped) > 5:
                         is_heading = True
-                    elif re.match(r'^\d+\.\s+[A-Z]', line_stripped):
+                    elif self.NUMBERED_HEADING_RE.match(line_stripped):
                         is_heading = True
 
                 if is_heading and line_stripped:
                     # Salva sezione precedente
-                    if current_section and current_text:
-                        current_section.text = '\n'.join(current_text)
+                    if current_section and current_buf.tell():
+                        current_section.text = current_buf.getvalue()[:-1]
                         current_section.end_page = page_num - 1
                         sections.append(current_section)
 
@@ -240,74 +399,96 @@ class LocalAnalyzer:
                         end_page=page_num,
                         text=""
                     )
-                    current_text = []
+                    current_buf = StringIO()
                     current_start = page_num
                 else:
-                    current_text.append(line)
+                    current_buf.write(line)
+                    current_buf.write('\n')
 
         # Ultima sezione
-        if current_section and current_text:
-            current_section.text = '\n'.join(current_text)
-            current_section.end_page = pages[-1][0] if pages else current_start
+        if current_section and current_buf.tell():
+            current_section.text = current_buf.getvalue()[:-1]
+            current_section.end_page = last_page_num or current_start
             sections.append(current_section)
 
-        # Se non trovate sezioni, crea una singola
+        # Se non trovate sezioni, crea una singola: senza heading tutto il
+        # testo è rimasto accumulato nel buffer
         if not sections:
-            full_text = '\n\n'.join(text for _, text in pages)
             sections = [DocumentSection(
                 title="Documento Completo",
                 start_page=1,
-                end_page=pages[-1][0] if pages else 1,
-                text=full_text
+                end_page=last_page_num or 1,
+                text=current_buf.getvalue()[:-1] if current_buf.tell() else ""
             )]
 
         return sections
 
-    def _extract_terms(self, text: str, page: int) -> list[ExtractedTerm]:
-        """Estrai tutti i termini rilevanti dal testo."""
-        terms = []
-
-        # Riferimenti normativi
-        for pattern in self.LAW_PATTERNS:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                context_start = max(0, match.start() - 50)
-                context_end = min(len(text), match.end() + 50)
-                terms.append(ExtractedTerm(
-                    term=match.group(0).strip(),
-                    term_type='law',
-                    context=text[context_start:context_end].replace('\n', ' '),
-                    page=page
+    def _extract_terms(
+        self, text: str, page: int
+    ) -> tuple[list[ExtractedTerm], dict[str, list[str]]]:
+        """Estrai tutti i termini rilevanti con una sola passata sul testo.
+
+        Ritorna sia la lista piatta che la vista per tipo, accumulata
+        durante l'estrazione stessa.
+        """
+        # Il loop sui match raccoglie solo record leggeri (tipo, termine,
+        # finestra di contesto come coppia di interi); le slice del testo
+        # e i dataclass vengono costruiti in un'unica passata successiva
+        records: list[tuple[str, str, int, int]] = []
+        for combined, group_map in self.COMBINED_TERM_RES:
+            self._extract_category(combined, group_map, text, records)
+
+        terms: list[ExtractedTerm] = []
+        by_type: defaultdict[str, list[str]] = defaultdict(list)
+        for term_type, term, context_start, context_end in records:
+            context = text[context_start:context_end]
+            if term_type != 'concept':
+                context = context.replace('\n', ' ')
+            terms.append(ExtractedTerm(
+                term=term,
+                term_type=term_type,
+                context=context,
+                page=page
+            ))
+            by_type[term_type].append(term)
+        return terms, dict(by_type)
+
+    def _extract_category(
+        self,
+        combined: re.Pattern,
+        group_map: dict[int, tuple[str, int | None]],
+        text: str,
+        records: list[tuple[str, str, int, int]],
+    ) -> None:
+        """Raccoglie i record (tipo, termine, contesto) di una categoria."""
+        text_len = len(text)
+        for match in combined.finditer(text):
+            term_type, inner = group_map[match.lastindex]
+            captured = match.group(inner) if inner else None
+
+            if term_type == 'law':
+                records.append((
+                    'law',
+                    match.group(0).strip(),
+                    max(0, match.start() - 50),
+                    min(text_len, match.end() + 50),
                 ))
 
-        # Definizioni
-        for pattern in self.DEFINITION_PATTERNS:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                if match.groups():
-                    term = match.group(1).strip() if match.group(1) else match.group(0)
-                    if len(term) > 3 and len(term) < 100:
-                        context_start = max(0, match.start() - 30)
-                        context_end = min(len(text), match.end() + 100)
-                        terms.append(ExtractedTerm(
-                            term=term,
-                            term_type='definition',
-                            context=text[context_start:context_end].replace('\n', ' '),
-                            page=page
-                        ))
-
-        # Concetti
-        for pattern in self.CONCEPT_PATTERNS:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                if match.groups():
-                    term = match.group(1).strip()
-                    if len(term) > 3 and len(term) < 80:
-                        terms.append(ExtractedTerm(
-                            term=term,
-                            term_type='concept',
-                            context=match.group(0),
-                            page=page
-                        ))
-
-        return terms
+            elif term_type == 'definition':
+                term = captured.strip() if captured else match.group(0)
+                if 3 < len(term) < 100:
+                    records.append((
+                        'definition',
+                        term,
+                        max(0, match.start() - 30),
+                        min(text_len, match.end() + 100),
+                    ))
+
+            elif term_type == 'concept' and captured:
+                term = captured.strip()
+                if 3 < len(term) < 80:
+                    # Contesto = il match stesso, senza finestra extra
+                    records.append(('concept', term, match.start(), match.end()))
 
     def _detect_title(self, pages: list[tuple[int, str]]) -> str:
         """Rileva il titolo del documento dalla prima pagina."""
@@ -336,8 +517,8 @@ class LocalAnalyzer:
         for i, sec in enumerate(sections, 1):
             summary_parts.append(f"{i}. {sec.title} (pp. {sec.start_page}-{sec.end_page})")
             if sec.extracted_terms:
-                laws = [t.term for t in sec.extracted_terms if t.term_type == 'law'][:3]
-                defs = [t.term for t in sec.extracted_terms if t.term_type == 'definition'][:3]
+                laws = sec.terms_by_type.get('law', [])[:3]
+                defs = sec.terms_by_type.get('definition', [])[:3]
                 if laws:
                     summary_parts.append(f"   Norme: {', '.join(laws)}")
                 if defs:
@@ -345,9 +526,12 @@ class LocalAnalyzer:
 
         summary_parts.append(f"\nTOTALE TERMINI ESTRATTI: {len(terms)}")
 
-        by_type = defaultdict(list)
-        for t in terms:
-            by_type[t.term_type].append(t.term)
+        # Vista globale per tipo: concatenazione delle viste per sezione,
+        # già popolate in estrazione (niente re-bucketing dei dataclass)
+        by_type: defaultdict[str, list[str]] = defaultdict(list)
+        for sec in sections:
+            for ttype, tterms in sec.terms_by_type.items():
+                by_type[ttype].extend(tterms)
 
         for ttype, tterms in by_type.items():
             unique = list(set(tterms))[:10]
@@ -553,18 +737,24 @@ class StrategicAPIProcessor:
     ):
         self.settings = settings
         self.progress = progress_callback or (lambda m, p: None)
+        # Directory per la cache su disco dei riassunti di sezione;
+        # impostata dalla pipeline prima di process_sections
+        self.cache_dir: Path | None = None
         genai.configure(api_key=settings.gemini_api_key)
-
-    def _call_api(self, prompt: str, max_retries: int = 5) -> str:
-        """Chiamata API con retry robusto."""
-        model = genai.GenerativeModel(
-            model_name=self.settings.model_name,
+        # Client costruito una volta sola: modello e config non cambiano
+        # mai durante una run, inutile rifarli a ogni chiamata
+        self._model = genai.GenerativeModel(
+            model_name=settings.model_name,
             generation_config=genai.GenerationConfig(
                 temperature=0.1,  # Bassa per precisione
                 max_output_tokens=8192,
             ),
         )
 
+    def _call_api(self, prompt: str, max_retries: int = 5) -> str:
+        """Chiamata API con retry robusto."""
+        model = self._model
+
         for attempt in range(max_retries):
             try:
                 response = model.generate_content(prompt)
@@ -582,36 +772,77 @@ class StrategicAPIProcessor:
                     time.sleep(5)
         return ""
 
-    def process_sections(self, analysis: DocumentAnalysis) -> list[str]:
-        """Elabora ogni sezione con una chiamata API dedicata."""
-        section_summaries = []
-
-        for i, section in enumerate(analysis.sections):
-            pct = 50 + int((i / len(analysis.sections)) * 30)
-            self.progress(f"Elaborazione: {section.title[:40]}...", pct)
-
-            # Prepara lista termini per questa sezione
-            terms_list = "\n".join(
-                f"- [{t.term_type.upper()}] {t.term}: {t.context[:100]}"
-                for t in section.extracted_terms[:50]
-            ) or "Nessun termine specifico identificato"
-
-            prompt = SECTION_PROMPT.format(
-                section_title=section.title,
-                start=section.start_page,
-                end=section.end_page,
-                extracted_terms=terms_list,
-                content=section.text[:50000]
-            )
-
-            summary = self._call_api(prompt)
-            section_summaries.append(summary)
+    def _cached_call(self, prompt: str) -> str:
+        """Chiamata API memoizzata su disco.
+
+        La chiave è l'hash del prompt (che include titolo, pagine, termini
+        e contenuto della sezione) più il modello: se uno qualsiasi cambia,
+        cambia la chiave e la cache si invalida da sola. Permette di
+        riprendere una run interrotta senza ripagare le sezioni già fatte.
+        """
+        if self.cache_dir is None:
+            return self._call_api(prompt)
+
+        key = hashlib.blake2b(
+            f"{self.settings.model_name}\n{prompt}".encode(),
+            digest_size=16
+        ).hexdigest()
+        cache_path = self.cache_dir / f"{key}.txt"
+        try:
+            if cache_path.exists():
+                return cache_path.read_text(encoding="utf-8")
+        except OSError:
+            pass  # Cache best-effort: file illeggibile → si richiama l'API
+
+        summary = self._call_api(prompt)
+        if summary:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                cache_path.write_text(summary, encoding="utf-8")
+            except OSError:
+                pass  # Senza disco la run prosegue comunque
+        return summary
+
+    def _process_one_section(
+        self, index: int, total: int, section: DocumentSection
+    ) -> str:
+        """Elabora una singola sezione con una chiamata API dedicata."""
+        pct = 50 + int((index / total) * 30)
+        self.progress(f"Elaborazione: {section.title[:40]}...", pct)
+
+        # Prepara lista termini per questa sezione
+        terms_list = "\n".join(
+            f"- [{t.term_type.upper()}] {t.term}: {t.context[:100]}"
+            for t in section.extracted_terms[:50]
+        ) or "Nessun termine specifico identificato"
+
+        prompt = SECTION_PROMPT.format(
+            section_title=section.title,
+            start=section.start_page,
+            end=section.end_page,
+            extracted_terms=terms_list,
+            content=section.text[:50000]
+        )
 
-            # Pausa tra chiamate
-            if i < len(analysis.sections) - 1:
-                time.sleep(2)
+        return self._cached_call(prompt)
 
-        return section_summaries
+    def process_sections(self, analysis: DocumentAnalysis) -> list[str]:
+        """Elabora le sezioni in parallelo con un pool limitato.
+
+        Le chiamate Gemini sono I/O-bound: un ThreadPoolExecutor con
+        api_concurrency worker comprime il wallclock invece della vecchia
+        sequenza con pausa fissa di 2s; eventuali 429 vengono assorbiti
+        dall'exponential backoff di _call_api.
+        """
+        total = len(analysis.sections)
+        with ThreadPoolExecutor(
+            max_workers=self.settings.api_concurrency
+        ) as executor:
+            futures = [
+                executor.submit(self._process_one_section, i, total, section)
+                for i, section in enumerate(analysis.sections)
+            ]
+            return [future.result() for future in futures]
 
     def generate_final_document(
         self,
@@ -679,14 +910,62 @@ class OutputValidator:
 
         return content, stats
 
+    # Fence markdown attorno all'output: un'unica alternation compilata
+    # copre le tre varianti (```latex, ```tex, ``` nudo) in una scansione
+    CLEAN_RE = re.compile(r"```(?:latex|tex)?\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
+
     def _clean_content(self, text: str) -> str:
         """Rimuovi artefatti markdown."""
         text = text.strip()
-        for pattern in [r"```latex\s*(.*?)\s*```", r"```tex\s*(.*?)\s*```", r"```\s*(.*?)\s*```"]:
-            match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        return text
+        match = self.CLEAN_RE.search(text)
+        return match.group(1).strip() if match else text
+
+    def _coverage_aho_corasick(
+        self,
+        content_lower: str,
+        unique_terms: dict[str, str]
+    ) -> tuple[int, set[str]]:
+        """Coverage con automa Aho-Corasick: una passata sull'output.
+
+        O(len(content) + somma lunghezze termini) al posto di una
+        scansione completa per termine; il match parziale sulle parole
+        lunghe dei termini non trovati usa lo stesso set di parole del
+        percorso senza automa, così i due percorsi danno lo stesso
+        risultato a parità di input.
+        """
+        # Un automa vuoto non è costruibile: iter() solleverebbe
+        if not unique_terms:
+            return 0, set()
+
+        automaton = ahocorasick.Automaton()
+        for term_lower in unique_terms:
+            automaton.add_word(term_lower, term_lower)
+        automaton.make_automaton()
+        hits = {value for _, value in automaton.iter(content_lower)}
+
+        found = 0
+        pending = []
+        for term_lower, original in unique_terms.items():
+            if term_lower in hits:
+                found += 1
+            else:
+                pending.append((term_lower, original))
+
+        if not pending:
+            return found, set()
+
+        # Match parziale sulle parole significative, con lookup O(1) sul
+        # set di parole dell'output (stessa semantica del fallback)
+        missing: set[str] = set()
+        content_words = set(re.findall(r'\w+', content_lower))
+
+        for term_lower, original in pending:
+            if any(w in content_words for w in term_lower.split() if len(w) > 4):
+                found += 1
+            else:
+                missing.add(original)
+
+        return found, missing
 
     def _calculate_coverage(
         self,
@@ -696,30 +975,43 @@ class OutputValidator:
         """Calcola quanti termini estratti sono presenti nell'output."""
         content_lower = content.lower()
 
-        found = 0
-        missing = []
-
-        for term in analysis.all_terms:
-            term_lower = term.term.lower()
-            # Cerca il termine o una sua variante
-            if term_lower in content_lower or term.term in content:
-                found += 1
-            else:
-                # Prova match parziale
-                words = term_lower.split()
-                if any(w in content_lower for w in words if len(w) > 4):
+        # L'estrazione produce molti duplicati (match sovrapposti): la
+        # stessa stringa non va mai ricercata più di una volta
+        unique_terms = {t.term_lower: t.term for t in analysis.all_terms}
+
+        if ahocorasick is not None:
+            found, missing = self._coverage_aho_corasick(content_lower, unique_terms)
+        else:
+            found = 0
+            # Set fin dall'inizio: dedup all'inserimento, niente passata
+            # list(set(...)) finale su una lista potenzialmente enorme
+            missing = set()
+
+            # Il match parziale diventa un lookup O(1) su un set di parole
+            # costruito una volta sola, invece di una scansione substring
+            # dell'intero output per ogni parola di ogni termine
+            content_words = set(re.findall(r'\w+', content_lower))
+
+            for term_lower, original in unique_terms.items():
+                # Cerca il termine o una sua variante
+                if term_lower in content_lower:
                     found += 1
                 else:
-                    missing.append(term.term)
-
-        total = len(analysis.all_terms) or 1
+                    # Prova match parziale
+                    words = term_lower.split()
+                    if any(w in content_words for w in words if len(w) > 4):
+                        found += 1
+                    else:
+                        missing.add(original)
+
+        total = len(unique_terms) or 1
         percentage = (found / total) * 100
 
         return {
             "found": found,
             "total": total,
             "percentage": percentage,
-            "missing": list(set(missing))
+            "missing": list(missing)
         }
 
 
@@ -739,7 +1031,9 @@ class SmartSummarizer:
         self.settings = settings or Settings()
         self.progress = progress_callback or (lambda m, p: print(f"[{p}%] {m}"))
 
-        self.analyzer = LocalAnalyzer(self.progress)
+        self.analyzer = LocalAnalyzer(
+            self.progress, workers=self.settings.extraction_workers
+        )
         self.processor = StrategicAPIProcessor(self.settings, self.progress)
         self.validator = OutputValidator(self.progress)
 
@@ -771,25 +1065,20 @@ class SmartSummarizer:
                 for ttype in ['law', 'definition', 'concept']
             }
         }
-        analysis_path.write_text(
-            json.dumps(analysis_data, indent=2, ensure_ascii=False),
-            encoding="utf-8"
-        )
+        _write_json(analysis_path, analysis_data)
 
         # === FASE 2: ELABORAZIONE API ===
+        self.processor.cache_dir = output_dir / ".section_cache"
         section_summaries = self.processor.process_sections(analysis)
 
         # Salva riassunti intermedi
         summaries_path = output_dir / f"{pdf_path.stem}_summaries.json"
-        summaries_path.write_text(
-            json.dumps({
-                "sections": [
-                    {"title": s.title, "summary": summ[:500] + "..."}
-                    for s, summ in zip(analysis.sections, section_summaries)
-                ]
-            }, indent=2, ensure_ascii=False),
-            encoding="utf-8"
-        )
+        _write_json(summaries_path, {
+            "sections": [
+                {"title": s.title, "summary": summ[:500] + "..."}
+                for s, summ in zip(analysis.sections, section_summaries)
+            ]
+        })
 
         # Genera documento finale
         final_latex = self.processor.generate_final_document(analysis, section_summaries)
@@ -801,12 +1090,9 @@ class SmartSummarizer:
         output_path = output_dir / f"{pdf_path.stem}_riassunto.txt"
         output_path.write_text(content, encoding="utf-8")
 
-        # Salva statistiche
+        # Salva statistiche (pretty: è il file che l'utente apre)
         stats_path = output_dir / f"{pdf_path.stem}_stats.json"
-        stats_path.write_text(
-            json.dumps(stats, indent=2, ensure_ascii=False),
-            encoding="utf-8"
-        )
+        _write_json(stats_path, stats, pretty=True)
 
         self.progress("Completato!", 100)
 